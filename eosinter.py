@@ -7,7 +7,6 @@ Created on Mon Nov 16 19:27:59 2015
 
 from __future__ import division, print_function
 
-import numexpr as ne
 import numpy as np
 
 try:
@@ -16,12 +15,81 @@ try:
 except:
     eosx_available = False
 
+try:
+    import cupy as cp
+    cupy_available = True
+except:
+    cupy_available = False
+
 import uio
 
 print("eosx available (eosinter):", eosx_available)
+print("cupy available (eosinter):", cupy_available)
+
+# Output-modes of the eos-kernels, combined with "|". Same values as in eosinterx.
+EXP = 1         # exponentiate the polynomial (pressure and temperature are tabulated logarithmically)
+DRHO = 2        # derivative with respect to density
+DEI = 4         # derivative with respect to internal energy
+SECOND = 8      # evaluate a second, exponentiated table at the same cells (temperature next to pressure)
+
+# CUDA-version of eosinterx.eos1D, one thread per cell, with the mode-flags above. Like on the CPU, the 16 coefficients
+# of an eos-cell are contiguous, thus a thread fetches them as one 64-byte segment, which neighbouring threads mostly
+# share.
+_EOS1D_CUDA = r'''
+__device__ double poly(const float* c, double x1, double x2) {
+    return c[0] + x1 * (c[1] + x1 * (c[2] + x1 * c[3])) + x2 * (
+        c[4] + x1 * (c[5] + x1 * (c[6] + x1 * c[7])) + x2 * (
+        c[8] + x1 * (c[9] + x1 * (c[10] + x1 * c[11])) + x2 * (
+        c[12] + x1 * (c[13] + x1 * (c[14] + x1 * c[15])))));
+}
+
+__device__ double poly_dx1(const float* c, double x1, double x2) {
+    return c[1] + x1 * (2 * c[2] + x1 * 3 * c[3]) + x2 * (
+        c[5] + x1 * (2 * c[6] + x1 * 3 * c[7]) + x2 * (
+        c[9] + x1 * (2 * c[10] + x1 * 3 * c[11]) + x2 * (
+        c[13] + x1 * (2 * c[14] + x1 * 3 * c[15]))));
+}
+
+__device__ double poly_dx2(const float* c, double x1, double x2) {
+    return c[4] + x1 * (c[5] + x1 * (c[6] + x1 * c[7])) + x2 * (
+        2 * (c[8] + x1 * (c[9] + x1 * (c[10] + x1 * c[11]))) + x2 *
+        3 * (c[12] + x1 * (c[13] + x1 * (c[14] + x1 * c[15]))));
+}
+
+extern "C" __global__
+void eos1D(const float* rho, const float* ei, const float* C, const float* C2, const double* lnx11d,
+           const double* lnx21d, double x1off, double x2off, double x1fac, double x2fac, double x2shift,
+           long long n1, long long n2, long long rowC, long long rowC2, int mode, long long n,
+           float* out, float* dvdrho, float* dvde, float* out2) {
+    long long i = (long long)blockDim.x * blockIdx.x + threadIdx.x;
+    if (i >= n) return;
+
+    double lnx1 = log((double)rho[i]);
+    double lnx2 = log(ei[i] + x2shift);
+    long long ti1 = (long long)fmin(fmax((lnx1 - x1off) * x1fac, 0.0), (double)n1);
+    long long ti2 = (long long)fmin(fmax((lnx2 - x2off) * x2fac, 0.0), (double)n2);
+    double x1ta = lnx1 - lnx11d[ti1];
+    double x2ta = lnx2 - lnx21d[ti2];
+    // rowC and rowC2 are the lengths of the second axis of C and C2, i.e. the number of cells per row
+    const float* c = C + (ti1 * rowC + ti2) * 16;
+    double val = poly(c, x1ta, x2ta);
+    double fac = 1.0;
+    if (mode & 1) {
+        val = exp(val);
+        fac = val;
+    }
+    out[i] = val;
+    if (mode & 2) dvdrho[i] = fac / rho[i] * poly_dx1(c, x1ta, x2ta);
+    if (mode & 4) dvde[i] = fac / (ei[i] + x2shift) * poly_dx2(c, x1ta, x2ta);
+    if (mode & 8) out2[i] = exp(poly(C2 + (ti1 * rowC2 + ti2) * 16, x1ta, x2ta));
+}
+'''
+
+if cupy_available:
+    _eos1D_gpu = cp.RawKernel(_EOS1D_CUDA, 'eos1D')
 
 class EosInter:
-    def __init__(self, fname):
+    def __init__(self, fname, dtype=np.float32):
         """
             Description
             -----------
@@ -29,54 +97,98 @@ class EosInter:
             Input
             -----
                 :param fname: string, path and name of file with eos-related tables.
+                :param dtype: np.float32 or np.float64, precision of the tables and of the computed quantities.
+                              float32 is sufficient for the interpolation, float64 is meant for validation.
+                              The kernels of opta accept only float32, so float64-results have to be cast before
+                              passing them to Opac.kappa.
         """
 
         self.eosf = uio.File(fname)
-
-        self.cent = self.eosf.block[0]['c1'].data.T
-        self.cpress = self.eosf.block[0]['c2'].data.T
-        self.ctemp = self.eosf.block[0]['c3'].data.T
-
-        if self.cent.dtype.byteorder != np.dtype('f').byteorder:
-            self.cent = self.cent.newbyteorder()
-            self.cent = self.cent.byteswap()
-            self.cpress = self.cpress.newbyteorder()
-            self.cpress = self.cpress.byteswap()
-            self.ctemp = self.ctemp.newbyteorder()
-            self.ctemp = self.ctemp.byteswap()
-
-        self.lnx11d = np.log(self.eosf.block[0]['x1'].data + self.eosf.block[0]['x1shift'].data).squeeze()
-        self.lnx21d = np.log(self.eosf.block[0]['x2'].data + self.eosf.block[0]['x2shift'].data).squeeze()
-        self.x2shift = self.eosf.block[0]['x2shift'].data
+        self._gpu = {}
+
+        # The coefficient-tables are stored once as native :param dtype: with shape (n1+1, n2+1, 16), so that the 16
+        # coefficients of a grid-cell are contiguous in memory and fetched together by the eosinterx-kernels. The
+        # tables start at a cache-line boundary, thus a float32-cell (64 bytes) occupies exactly one cache-line and a
+        # float64-cell (128 bytes) two.
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError("dtype has to be float32 or float64, not {0}.".format(self.dtype))
+        self.cent = self._coefficients('c1')
+        self.cpress = self._coefficients('c2')
+        self.ctemp = self._coefficients('c3')
+
+        self.lnx11d = np.log(self.eosf.block[0]['x1'].data + self.eosf.block[0]['x1shift'].data,
+                             dtype=np.float64).squeeze()
+        self.lnx21d = np.log(self.eosf.block[0]['x2'].data + self.eosf.block[0]['x2shift'].data,
+                             dtype=np.float64).squeeze()
+        self.x2shift = float(np.squeeze(self.eosf.block[0]['x2shift'].data))
 
         self.n1 = self.lnx11d.size - 1
         self.n2 = self.lnx21d.size - 1
+        # the kernels clamp the cell-indices to n1 and n2 without bounds-checks
+        for name, C in (('c1', self.cent), ('c2', self.cpress), ('c3', self.ctemp)):
+            if C.shape[:2] != (self.n1 + 1, self.n2 + 1):
+                raise ValueError("Table {0} has {1}x{2} cells, but the grid needs {3}x{4}.".format(
+                    name, C.shape[0], C.shape[1], self.n1 + 1, self.n2 + 1))
 
         self.x1fac = self.n1 / (self.lnx11d.max() - self.lnx11d.min())
         self.x2fac = self.n2 / (self.lnx21d.max() - self.lnx21d.min())
-
-    def _prep(self, rho, ei):
-        nx1 = rho.size - 1
-        nx2 = rho.size - 2
-
-        x2 = self.x2shift
-
-        lnx1 = ne.evaluate("log(rho)")
-        lnx2 = ne.evaluate("log(ei+x2)")
-
-        x1fac, x2fac = self.x1fac, self.x2fac
-        x1off, x2off = self.lnx11d[0], self.lnx21d[0]
-
-        i1 = ne.evaluate("(lnx1 - x1off) * x1fac").astype(np.int32).clip(0, min(nx1, self.n1))
-        i2 = ne.evaluate("(lnx2 - x2off) * x2fac").astype(np.int32).clip(0, min(nx2, self.n2))
-
-        lnx11d = self.lnx11d[i1]
-        lnx21d = self.lnx21d[i2]
-
-        x1ta = ne.evaluate('lnx1 - lnx11d')
-        x2ta = ne.evaluate('lnx2 - lnx21d')
-
-        return x1ta, x2ta, i1, i2
+        self.x1off = float(self.lnx11d[0])
+        self.x2off = float(self.lnx21d[0])
+
+        # grid-arguments of the kernels, which do not change after opening the file. The cell-indices are clamped to
+        # the last row and column of the tables, n1 and n2.
+        self._gridargs = (self.lnx11d, self.lnx21d, self.x1off, self.x2off, self.x1fac, self.x2fac, self.x2shift,
+                          self.n1, self.n2)
+
+    def _coefficients(self, name, align=64):
+        c = self.eosf.block[0][name].data.transpose(1, 0, 2)
+        nbytes = c.size * self.dtype.itemsize
+        buf = np.empty(nbytes + align, dtype=np.uint8)
+        start = -buf.ctypes.data % align
+        out = buf[start:start + nbytes].view(self.dtype).reshape(c.shape)
+        out[...] = c
+        return out
+
+    def _fields(self, rho, ei):
+        return (np.ascontiguousarray(rho, dtype=self.dtype).ravel(),
+                np.ascontiguousarray(ei, dtype=self.dtype).ravel())
+
+    def _eos(self, rho, ei, C, mode, C2=None):
+        if cupy_available and isinstance(rho, cp.ndarray):
+            return self._eos_gpu(rho, ei, C, mode, C2)
+        if not eosx_available:
+            raise IOError("Compilation of eosinterx.pyx necessary.")
+        r, e = self._fields(rho, ei)
+        return tuple(a.reshape(np.shape(rho)) for a in eosx.eos1D(r, e, C, C2, *self._gridargs, mode=mode))
+
+    def _device(self, a):
+        # tables are copied to the GPU on first use and kept there
+        if id(a) not in self._gpu:
+            self._gpu[id(a)] = cp.asarray(a)
+        return self._gpu[id(a)]
+
+    def _eos_gpu(self, rho, ei, C, mode, C2=None):
+        if self.dtype != np.float32:
+            raise ValueError("The GPU-kernel supports only float32-tables.")
+        r = cp.ascontiguousarray(rho, dtype=cp.float32).ravel()
+        e = cp.ascontiguousarray(ei, dtype=cp.float32).ravel()
+        n = r.size
+        lnx11d, lnx21d, x1off, x2off, x1fac, x2fac, x2shift, n1, n2 = self._gridargs
+        wanted = (True, mode & DRHO, mode & DEI, mode & SECOND)
+        outs = [cp.empty(n if w else 0, dtype=cp.float32) for w in wanted]
+        if n == 0:
+            return tuple(a.reshape(rho.shape) for a, w in zip(outs, wanted) if w)
+        if mode & SECOND and C2 is None:
+            raise ValueError("SECOND needs a second table of coefficients.")
+        rowC2 = C2.shape[1] if C2 is not None else 0
+        C2 = self._device(C2) if C2 is not None else cp.empty(0, dtype=cp.float32)
+        threads = 256
+        _eos1D_gpu(((n + threads - 1) // threads,), (threads,),
+                   (r, e, self._device(C), C2, self._device(lnx11d), self._device(lnx21d), np.float64(x1off),
+                    np.float64(x2off), np.float64(x1fac), np.float64(x2fac), np.float64(x2shift), np.int64(n1),
+                    np.int64(n2), np.int64(C.shape[1]), np.int64(rowC2), np.int32(mode), np.int64(n)) + tuple(outs))
+        return tuple(a.reshape(rho.shape) for a, w in zip(outs, wanted) if w)
 
     def unit(self, quantity="Pressure"):
         """
@@ -121,16 +233,6 @@ class EosInter:
             ------
                 :return: ndarray, shape of simulation box, values of :param quantity:.
         """
-        if not eosx_available:
-            raise IOError("Compilation of eosinterx.pyx necessary.")
-        x1ta, x2ta, i1, i2 = self._prep(rho, ei)
-
-        funcs = {3: eosx.STP3D, 4: eosx.STP4D}
-        try:
-            func = funcs[rho.ndim]
-        except KeyError:
-            raise ValueError("Wrong dimension. Only 3D- and 4D-arrays supported.")
-
         if quantity in ["Entropy", "entropy", "E", "e", "S", "s"]:
             C = self.cent
         elif quantity in ["Pressure", "pressure", "P", "p"]:
@@ -140,10 +242,7 @@ class EosInter:
         else:
             raise ValueError("{0} as quantity is not supported.".format(quantity))
 
-        if quantity in ["Entropy", "entropy", "E", "e"]:
-            return func(C, i1, i2, x1ta, x2ta)
-        else:
-            return ne.evaluate("exp(val)", local_dict={'val': func(C, i1, i2, x1ta, x2ta)})
+        return self._eos(rho, ei, C, 0 if C is self.cent else EXP)[0]
 
     def PandT(self, rho, ei):
         """
@@ -159,17 +258,7 @@ class EosInter:
                 :return: ndarray, shape of simulation box, pressure,
                          ndarray, shape of simulation box, temperature.
         """
-        if not eosx_available:
-            raise IOError("Compilation of eosinterx.pyx necessary.")
-        x1ta, x2ta, i1, i2 = self._prep(rho, ei)
-
-        if rho.ndim == 3:
-            P, T = eosx.PandT3D(self.cpress, self.ctemp, i1, i2, x1ta, x2ta)
-        elif rho.ndim == 4:
-            P, T = eosx.PandT4D(self.cpress, self.ctemp, i1, i2, x1ta, x2ta)
-        else:
-            raise ValueError("Wrong dimension. Only 3D- and 4D-arrays supported.")
-        return ne.evaluate("exp(P)"), ne.evaluate("exp(T)")
+        return self._eos(rho, ei, self.cpress, EXP | SECOND, self.ctemp)
 
     def Pall(self, rho, ei):
         """
@@ -186,16 +275,7 @@ class EosInter:
                          ndarray, shape of simulation box, dPdrho.
                          ndarray, shape of simulation box, dPdei.
         """
-        if not eosx_available:
-            raise IOError("Compilation of eosinterx.pyx necessary.")
-        x1ta, x2ta, i1, i2 = self._prep(rho, ei)
-
-        if rho.ndim == 3:
-            return eosx.Pall3D(rho, ei, self.cpress, i1, i2, x1ta, x2ta, self.x2shift)
-        elif rho.ndim == 4:
-            return eosx.Pall4D(rho, ei, self.cpress, i1, i2, x1ta, x2ta, self.x2shift)
-        else:
-            raise ValueError("Wrong dimension. Only 3D- and 4D-arrays supported.")
+        return self._eos(rho, ei, self.cpress, EXP | DRHO | DEI)
 
     def Tall(self, rho, ei):
         """
@@ -211,13 +291,4 @@ class EosInter:
                 :return: ndarray, shape of simulation box, pressure,
                          ndarray, shape of simulation box, dTdei.
         """
-        if not eosx_available:
-            raise IOError("Compilation of eosinterx.pyx necessary.")
-        x1ta, x2ta, i1, i2 = self._prep(rho, ei)
-
-        if rho.ndim == 3:
-            return eosx.Tall3D(ei, self.ctemp, i1, i2, x1ta, x2ta, self.x2shift)
-        elif rho.ndim == 4:
-            return eosx.Tall4D(ei, self.ctemp, i1, i2, x1ta, x2ta, self.x2shift)
-        else:
-            raise ValueError("Wrong dimension. Only 3D- and 4D-arrays supported.")
+        return self._eos(rho, ei, self.ctemp, EXP | DEI)
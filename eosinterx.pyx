@@ -12,7 +12,7 @@ from cython.parallel import prange
 
 cimport cython
 cimport numpy as np
-from libc.math cimport exp, log10, log
+from libc.math cimport exp, log10, log, pow
 
 DTYPE = np.int32
 DTYPEf = np.float32
@@ -22,331 +22,161 @@ ctypedef np.int32_t DTYPE_t
 ctypedef np.float32_t DTYPEf_t
 ctypedef np.float64_t DTYPEf64_t
 
-cdef inline DTYPE_t int_max(DTYPE_t a, DTYPE_t b): return a if a >= b else b
-cdef inline DTYPE_t int_min(DTYPE_t a, DTYPE_t b): return a if a <= b else b
+# precision of the eos-kernel: float32 by default, float64 for validation
+ctypedef fused DTYPEfl_t:
+    np.float32_t
+    np.float64_t
 
-cdef inline DTYPEf_t float_max(DTYPEf_t a, DTYPEf_t b): return a if a >= b else b
-cdef inline DTYPEf_t float_min(DTYPEf_t a, DTYPEf_t b): return a if a <= b else b
+cdef inline DTYPE_t int_max(DTYPE_t a, DTYPE_t b) nogil: return a if a >= b else b
+cdef inline DTYPE_t int_min(DTYPE_t a, DTYPE_t b) nogil: return a if a <= b else b
 
+cdef inline DTYPEf_t float_max(DTYPEf_t a, DTYPEf_t b) nogil: return a if a >= b else b
+cdef inline DTYPEf_t float_min(DTYPEf_t a, DTYPEf_t b) nogil: return a if a <= b else b
 
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cpdef STP3D(np.ndarray[DTYPEf_t, ndim=3] C, np.ndarray[DTYPE_t, ndim=3] i1, np.ndarray[DTYPE_t, ndim=3] i2,
-            np.ndarray[DTYPEf_t, ndim=3] x1ta, np.ndarray[DTYPEf_t, ndim=3] x2ta):
-    """
-        Description:
-            Computes the entropy, pressure, or temperature with the help of the eos-file.
-        inputs:
-            :param rho: numpy-ndarray, 3D, shape of simulation box, density-field
-            :param ei: numpy-ndarray, 3D, shape of simulation box, internal energy-field
-            :param C: ndarray, interpolation coefficients of eos-file
-            :param i1: numpy-ndarray, 3D, indices for pressure-dimension of C
-            :param i2: numpy-ndarray, 3D, indices for temperature-dimension of C
-            :param x1ta: numpy-ndarray, 3D, interpolation-factors along pressure-dimension
-            :param x2ta: numpy-ndarray, 3D, interpolation-factors along temperature-dimension
-        output:
-            :return: ndarray, shape of simulation box, values of :param quantity:. The function returns entropy, or
-            log(P), or log(T)
-    """
-    cdef DTYPE_t i, j, k, ti1, ti2
-    cdef DTYPE_t nx = i1.shape[0]
-    cdef DTYPE_t ny = i1.shape[1]
-    cdef DTYPE_t nz = i1.shape[2]
-    cdef np.ndarray[DTYPEf_t, ndim=3] out = np.empty((nx, ny, nz), dtype=DTYPEf)
+cdef inline DTYPEf64_t double_max(DTYPEf64_t a, DTYPEf64_t b) nogil: return a if a >= b else b
+cdef inline DTYPEf64_t double_min(DTYPEf64_t a, DTYPEf64_t b) nogil: return a if a <= b else b
 
-    # for i in range(nx):
-    for i in prange(nx, nogil=True):
-        for j in range(ny):
-            for k in range(nz):
-                ti1 = i1[i, j, k]
-                ti2 = i2[i, j, k]
-                out[i,j,k] = C[0,ti1,ti2] + x1ta[i,j,k] * (C[1,ti1,ti2] + x1ta[i,j,k] * (C[2,ti1,ti2] + x1ta[i,j,k] *
-                    C[3,ti1,ti2])) + x2ta[i,j,k] * (C[4,ti1,ti2] + x1ta[i,j,k] * (C[5,ti1, ti2] + x1ta[i,j,k] *
-                    (C[6,ti1,ti2] + x1ta[i,j,k] * C[7,ti1,ti2])) + x2ta[i,j,k] * (C[8,ti1,ti2] + x1ta[i,j,k] *
-                    (C[9,ti1, ti2] + x1ta[i,j,k] * (C[10,ti1,ti2] + x1ta[i,j,k] * C[11,ti1, ti2])) + x2ta[i,j,k] *
-                    (C[12,ti1,ti2] + x1ta[i,j,k] * (C[13,ti1,ti2] + x1ta[i,j,k] * (C[14,ti1, ti2] + x1ta[i,j,k] *
-                    C[15,ti1,ti2])))))
-    return out
 
+# Output-modes of eos1D, combined with "|".
+EXP = 1         # exponentiate the polynomial (pressure and temperature are tabulated logarithmically)
+DRHO = 2        # derivative with respect to density
+DEI = 4         # derivative with respect to internal energy
+SECOND = 8      # evaluate a second, exponentiated table at the same cells (temperature next to pressure)
 
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cpdef STP4D(np.ndarray[DTYPEf_t, ndim=3] C, np.ndarray[DTYPE_t, ndim=4] i1, np.ndarray[DTYPE_t, ndim=4] i2,
-            np.ndarray[DTYPEf_t, ndim=4] x1ta, np.ndarray[DTYPEf_t, ndim=4] x2ta):
+# Fields with fewer cells (1D-probes, profiles) are interpolated by the calling thread only, since starting the
+# OpenMP-team costs more than the loop itself. Larger fields use all threads OpenMP provides (OMP_NUM_THREADS).
+SERIAL_SIZE = 10000
+
+# size of the OpenMP-team, 1 if compiled without OpenMP (setup_np.py)
+cdef extern from *:
     """
-        Description:
-            Computes the entropy, pressure, or temperature with the hekp of the eos-file.
-        inputs:
-            :param rho: ndarray, shape of simulation box, density-field
-            :param ei: ndarray, shape of simulation box, internal energy-field
-            :param quantity: string, the demanded quantity
-        output:
-            :return: ndarray, shape of simulation box, values of :param quantity:. The function returns entropy, or
-            log(P), or log(T)
+    #ifdef _OPENMP
+    #include <omp.h>
+    #define eos_max_threads() omp_get_max_threads()
+    #else
+    #define eos_max_threads() 1
+    #endif
     """
-    cdef DTYPE_t i, j, k, l, ti1, ti2
-    cdef DTYPE_t nt = i1.shape[0]
-    cdef DTYPE_t nx = i1.shape[1]
-    cdef DTYPE_t ny = i1.shape[2]
-    cdef DTYPE_t nz = i1.shape[3]
-    cdef np.ndarray[DTYPEf_t, ndim = 4] out = np.empty((nt, nx, ny, nz), dtype=DTYPEf)
+    int eos_max_threads() nogil
 
-    for i in range(nt):
-        # for j in range(nx):
-        for j in prange(nx, nogil=True):
-            for k in range(ny):
-                for l in range(nz):
-                    ti1 = i1[i, j, k, l]
-                    ti2 = i2[i, j, k, l]
-                    out[i,j,k,l] = C[0,ti1,ti2] + x1ta[i, j, k, l] * (C[1, ti1, ti2] + x1ta[i, j, k, l] *
-                        (C[2, ti1, ti2] + x1ta[i, j, k, l] * C[3, ti1, ti2])) + x2ta[i, j, k, l] * (C[4, ti1, ti2] +
-                        x1ta[i, j, k, l] * (C[5, ti1, ti2] + x1ta[i, j, k, l] * (C[6, ti1, ti2] + x1ta[i, j, k, l] *
-                        C[7, ti1, i2[i, j, k ,l]])) + x2ta[i, j, k, l] * (C[8, ti1, ti2] + x1ta[i, j, k, l] *
-                        (C[9, ti1, ti2] + x1ta[i, j, k, l] * (C[10, ti1, ti2] + x1ta[i, j, k, l] * C[11, ti1, ti2])) +
-                        x2ta[i, j, k ,l] * (C[12, ti1, ti2] + x1ta[i, j, k, l] * (C[13, ti1, ti2] + x1ta[i, j, k, l] *
-                        (C[14, ti1, ti2] + x1ta[i, j, k, l] * C[15, ti1, ti2])))))
-    return out
 
+cdef inline DTYPEf64_t poly(DTYPEfl_t* c, DTYPEf64_t x1, DTYPEf64_t x2) nogil:
+    # bicubic polynomial of one eos-cell, c points to its 16 coefficients
+    return c[0] + x1 * (c[1] + x1 * (c[2] + x1 * c[3])) + x2 * (
+        c[4] + x1 * (c[5] + x1 * (c[6] + x1 * c[7])) + x2 * (
+        c[8] + x1 * (c[9] + x1 * (c[10] + x1 * c[11])) + x2 * (
+        c[12] + x1 * (c[13] + x1 * (c[14] + x1 * c[15])))))
 
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cpdef PandT3D(np.ndarray[DTYPEf_t, ndim=3] CP, np.ndarray[DTYPEf_t, ndim=3] CT, np.ndarray[DTYPE_t, ndim=3] i1,
-              np.ndarray[DTYPE_t, ndim=3] i2, np.ndarray[DTYPEf_t, ndim=3] x1ta, np.ndarray[DTYPEf_t, ndim=3] x2ta):
-    cdef DTYPE_t i, j, k, ti1, ti2
-    cdef DTYPE_t nx = i1.shape[0]
-    cdef DTYPE_t ny = i1.shape[1]
-    cdef DTYPE_t nz = i1.shape[2]
-    cdef np.ndarray[DTYPEf_t, ndim = 3] P = np.empty((nx, ny, nz), dtype=DTYPEf)
-    cdef np.ndarray[DTYPEf_t, ndim = 3] T = np.empty((nx, ny, nz), dtype=DTYPEf)
 
-    # for i in range(nx):
-    for i in prange(nx, nogil=True):
-        for j in range(ny):
-            for k in range(nz):
-                ti1 = i1[i, j, k]
-                ti2 = i2[i, j, k]
-                P[i, j, k] = CP[0, ti1, ti2] + x1ta[i, j, k] * (CP[1, ti1, ti2] + x1ta[i, j, k] * (CP[2, ti1, ti2] +
-                    x1ta[i, j, k] * CP[3, ti1, ti2])) + x2ta[i, j, k] * (CP[4, ti1, ti2] + x1ta[i, j, k] *
-                    (CP[5, ti1, ti2] + x1ta[i, j, k] * (CP[6, ti1, ti2] + x1ta[i, j, k] * CP[7, ti1, ti2])) +
-                    x2ta[i, j, k] * (CP[8, ti1, ti2] + x1ta[i, j, k] * (CP[9, ti1, ti2] + x1ta[i, j, k] *
-                    (CP[10, ti1, ti2] + x1ta[i, j, k] * CP[11, ti1, ti2])) + x2ta[i, j, k] * (CP[12, ti1, ti2] +
-                    x1ta[i, j, k] * (CP[13, ti1, ti2] + x1ta[i, j, k] * (CP[14, ti1, ti2] + x1ta[i, j, k] *
-                    CP[15, ti1, ti2])))))
-                T[i, j, k] = CT[0, ti1, ti2] + x1ta[i, j, k] * (CT[1, ti1, ti2] + x1ta[i, j, k] * (CT[2, ti1, ti2] +
-                    x1ta[i, j, k] * CT[3, ti1, ti2])) + x2ta[i, j, k] * (CT[4, ti1, ti2] + x1ta[i, j, k] *
-                    (CT[5, ti1, ti2] + x1ta[i, j, k] * (CT[6, ti1, ti2] + x1ta[i, j, k] * CT[7, ti1, ti2])) +
-                    x2ta[i, j, k] * (CT[8, ti1, ti2] + x1ta[i, j, k] * (CT[9, ti1, ti2] + x1ta[i, j, k] *
-                    (CT[10, ti1, ti2] + x1ta[i, j, k] * CT[11, ti1, ti2])) + x2ta[i, j, k] * (CT[12, ti1, ti2] +
-                    x1ta[i, j, k] * (CT[13, ti1, ti2] + x1ta[i, j, k] * (CT[14, ti1, ti2] + x1ta[i, j, k] *
-                    CT[15, ti1, ti2])))))
-    return P, T
-
-
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cpdef PandT4D(np.ndarray[DTYPEf_t, ndim=3] CP, np.ndarray[DTYPEf_t, ndim=3] CT, np.ndarray[DTYPE_t, ndim=4] i1,
-              np.ndarray[DTYPE_t, ndim=4] i2, np.ndarray[DTYPEf_t, ndim=4] x1ta, np.ndarray[DTYPEf_t, ndim=4] x2ta):
-    cdef DTYPE_t i, j, k, l, ti1, ti2
-    cdef DTYPE_t nt = i1.shape[0]
-    cdef DTYPE_t nx = i1.shape[1]
-    cdef DTYPE_t ny = i1.shape[2]
-    cdef DTYPE_t nz = i1.shape[3]
-    cdef np.ndarray[DTYPEf_t, ndim = 4] P = np.empty((nt, nx, ny, nz), dtype=DTYPEf)
-    cdef np.ndarray[DTYPEf_t, ndim = 4] T = np.empty((nt, nx, ny, nz), dtype=DTYPEf)
-
-    for i in range(nt):
-        # for j in range(nx):
-        for j in prange(nx, nogil=True):
-            for k in range(ny):
-                for l in range(nz):
-                    ti1 = i1[i, j, k, l]
-                    ti2 = i2[i, j, k, l]
-                    P[i, j, k, l] = CP[0, ti1, ti2] + x1ta[i, j, k, l] * (CP[1, ti1, ti2] + x1ta[i, j, k, l] *
-                        (CP[2, ti1, ti2] + x1ta[i, j, k, l] * CP[3, ti1, ti2])) + x2ta[i, j, k, l] * (CP[4, ti1, ti2] +
-                        x1ta[i, j, k, l] * (CP[5, ti1, ti2] + x1ta[i, j, k, l] * (CP[6, ti1, ti2] + x1ta[i, j, k, l] *
-                        CP[7, ti1, i2[i, j, k ,l]])) + x2ta[i, j, k, l] * (CP[8, ti1, ti2] + x1ta[i, j, k, l] *
-                        (CP[9, ti1, ti2] + x1ta[i, j, k, l] * (CP[10, ti1, ti2] + x1ta[i, j, k, l] * CP[11, ti1, ti2])) +
-                        x2ta[i, j, k ,l] * (CP[12, ti1, ti2] + x1ta[i, j, k, l] * (CP[13, ti1, ti2] + x1ta[i, j, k, l] *
-                        (CP[14, ti1, ti2] + x1ta[i, j, k, l] * CP[15, ti1, ti2])))))
-                    T[i, j, k, l] = CT[0, ti1, ti2] + x1ta[i, j, k, l] * (CT[1, ti1, ti2] + x1ta[i, j, k, l] *
-                        (CT[2, ti1, ti2] + x1ta[i, j, k, l] * CT[3, ti1, ti2])) + x2ta[i, j, k, l] * (CT[4, ti1, ti2] +
-                        x1ta[i, j, k, l] * (CT[5, ti1, ti2] + x1ta[i, j, k, l] * (CT[6, ti1, ti2] + x1ta[i, j, k, l] *
-                        CT[7, ti1, i2[i, j, k ,l]])) + x2ta[i, j, k, l] * (CT[8, ti1, ti2] + x1ta[i, j, k, l] *
-                        (CT[9, ti1, ti2] + x1ta[i, j, k, l] * (CT[10, ti1, ti2] + x1ta[i, j, k, l] * CT[11, ti1, ti2])) +
-                        x2ta[i, j, k ,l] * (CT[12, ti1, ti2] + x1ta[i, j, k, l] * (CT[13, ti1, ti2] + x1ta[i, j, k, l] *
-                        (CT[14, ti1, ti2] + x1ta[i, j, k, l] * CT[15, ti1, ti2])))))
-    return P, T
+cdef inline DTYPEf64_t poly_dx1(DTYPEfl_t* c, DTYPEf64_t x1, DTYPEf64_t x2) nogil:
+    # derivative of poly with respect to x1 = log(rho)
+    return c[1] + x1 * (2 * c[2] + x1 * 3 * c[3]) + x2 * (
+        c[5] + x1 * (2 * c[6] + x1 * 3 * c[7]) + x2 * (
+        c[9] + x1 * (2 * c[10] + x1 * 3 * c[11]) + x2 * (
+        c[13] + x1 * (2 * c[14] + x1 * 3 * c[15]))))
 
 
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cpdef Pall3D(np.ndarray[DTYPEf_t, ndim=3] rho, np.ndarray[DTYPEf_t, ndim=3] ei, np.ndarray[DTYPEf_t, ndim=3] C,
-             np.ndarray[DTYPE_t, ndim=3] i1, np.ndarray[DTYPE_t, ndim=3] i2, np.ndarray[DTYPEf_t, ndim=3] x1ta,
-             np.ndarray[DTYPEf_t, ndim=3] x2ta, DTYPEf_t x2shift):
-    cdef DTYPE_t i, j, k, ti1, ti2
-    cdef DTYPE_t nx = rho.shape[0]
-    cdef DTYPE_t ny = rho.shape[1]
-    cdef DTYPE_t nz = rho.shape[2]
-    cdef np.ndarray[DTYPEf_t, ndim = 3] P = np.empty((nx, ny, nz), dtype=DTYPEf)
-    cdef np.ndarray[DTYPEf_t, ndim = 3] dPdrho = np.empty((nx, ny, nz), dtype=DTYPEf)
-    cdef np.ndarray[DTYPEf_t, ndim = 3] dPde = np.empty((nx, ny, nz), dtype=DTYPEf)
-
-
-    # for i in range(nx):
-    for i in prange(nx, nogil=True):
-        for j in range(ny):
-            for k in range(nz):
-                ti1 = i1[i, j, k]
-                ti2 = i2[i, j, k]
-                P[i, j, k] = exp(C[0, ti1, ti2] + x1ta[i, j, k] * (C[1, ti1, ti2] + x1ta[i, j, k] * (C[2, ti1, ti2] +
-                    x1ta[i, j, k] * C[3, ti1, ti2])) + x2ta[i, j, k] * (C[4, ti1, ti2] + x1ta[i, j, k] * (C[5, ti1, ti2] +
-                    x1ta[i, j, k] * (C[6, ti1, ti2] + x1ta[i, j, k] * C[7, ti1, ti2])) + x2ta[i, j, k] * (C[8, ti1, ti2] +
-                    x1ta[i, j, k] * (C[9, ti1, ti2] + x1ta[i, j, k] * (C[10, ti1, ti2] + x1ta[i, j, k] * C[11, ti1, ti2])) +
-                    x2ta[i, j, k] * (C[12, ti1, ti2] + x1ta[i, j, k] * (C[13, ti1, ti2] + x1ta[i, j, k] * (C[14, ti1, ti2] +
-                    x1ta[i, j, k] * C[15, ti1, ti2]))))))
-
-                dPdrho[i,j,k] = P[i,j,k] / rho[i,j,k] * (C[1,ti1,ti2] + x1ta[i,j,k] * (2 * C[2,ti1,ti2] + x1ta[i,j,k] *
-                    3 * C[3,ti1,ti2]) + x2ta[i,j,k]*(C[5,ti1,ti2] + x1ta[i,j,k] * (2 * C[6,ti1,ti2] + x1ta[i,j,k] * 3 *
-                    C[7,ti1,ti2]) + x2ta[i,j,k] * (C[9,ti1,ti2] + x1ta[i,j,k] * (2 * C[10,ti1,ti2] + x1ta[i,j,k] * 3 *
-                    C[11,ti1,ti2]) + x2ta[i,j,k] * (C[13,ti1,ti2] + x1ta[i,j,k] * (2 * C[14,ti1,ti2] + x1ta[i,j,k] * 3 *
-                    C[15,ti1,ti2])))))
-
-                dPde[i,j,k] = P[i,j,k] / (ei[i,j,k] + x2shift) * (C[4,ti1,ti2] + x1ta[i,j,k] * (C[5,ti1,ti2] + x1ta[i,j,k] *
-                    (C[6,ti1,ti2] + x1ta[i,j,k] * C[7,ti1,ti2])) + 2 * x2ta[i,j,k] * (C[8,ti1,ti2] + x1ta[i,j,k] *
-                    (C[9,ti1,ti2] + x1ta[i,j,k] * (C[10,ti1,ti2] + x1ta[i,j,k] * C[11,ti1,ti2])) + 1.5 * x2ta[i,j,k] *
-                    (C[12,ti1,ti2] + x1ta[i,j,k] * (C[13,ti1,ti2] + x1ta[i,j,k] * (C[14,ti1,ti2] + x1ta[i,j,k] *
-                    C[15,ti1,ti2])))))
-    return P, dPdrho, dPde
+cdef inline DTYPEf64_t poly_dx2(DTYPEfl_t* c, DTYPEf64_t x1, DTYPEf64_t x2) nogil:
+    # derivative of poly with respect to x2 = log(ei + x2shift)
+    return c[4] + x1 * (c[5] + x1 * (c[6] + x1 * c[7])) + x2 * (
+        2 * (c[8] + x1 * (c[9] + x1 * (c[10] + x1 * c[11]))) + x2 *
+        3 * (c[12] + x1 * (c[13] + x1 * (c[14] + x1 * c[15]))))
 
 
 @cython.cdivision(True)
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cpdef Pall4D(np.ndarray[DTYPEf_t, ndim=4] rho, np.ndarray[DTYPEf_t, ndim=4] ei, np.ndarray[DTYPEf_t, ndim=3] C,
-             np.ndarray[DTYPE_t, ndim=4] i1, np.ndarray[DTYPE_t, ndim=4] i2, np.ndarray[DTYPEf_t, ndim=4] x1ta,
-             np.ndarray[DTYPEf_t, ndim=4] x2ta, DTYPEf_t x2shift):
-    cdef DTYPE_t i, j, k, l, ti1, ti2
-    cdef DTYPE_t nt = rho.shape[0]
-    cdef DTYPE_t nx = rho.shape[1]
-    cdef DTYPE_t ny = rho.shape[2]
-    cdef DTYPE_t nz = rho.shape[3]
-    cdef np.ndarray[DTYPEf_t, ndim = 4] P = np.empty((nt, nx, ny, nz), dtype=DTYPEf)
-    cdef np.ndarray[DTYPEf_t, ndim = 4] dPdrho = np.empty((nt, nx, ny, nz), dtype=DTYPEf)
-    cdef np.ndarray[DTYPEf_t, ndim = 4] dPde = np.empty((nt, nx, ny, nz), dtype=DTYPEf)
-
-    for i in range(nt):
-        # for j in range(nx):
-        for j in prange(nx, nogil=True):
-            for k in range(ny):
-                for l in range(nz):
-                    ti1 = i1[i,j,k,l]
-                    ti2 = i2[i,j,k,l]
-                    P[i,j,k,l] = exp(C[0,ti1, ti2] + x1ta[i,j,k,l] * (C[1,ti1,ti2] + x1ta[i,j,k,l] * (C[2,ti1,ti2] +
-                        x1ta[i,j,k,l] * C[3,ti1,ti2])) + x2ta[i,j,k,l] * (C[4,ti1,ti2] + x1ta[i,j,k,l] * (C[5,ti1,ti2] +
-                        x1ta[i,j,k,l] * (C[6,ti1,ti2] + x1ta[i,j,k,l] * C[7,ti1,ti2])) + x2ta[i,j,k,l] * (C[8,ti1,ti2] +
-                        x1ta[i,j,k,l] * (C[9,ti1,ti2] + x1ta[i,j,k,l] * (C[10,ti1,ti2] + x1ta[i,j,k,l] * C[11,ti1, ti2])) +
-                        x2ta[i,j,k,l] * (C[12, ti1, ti2] + x1ta[i,j,k,l] * (C[13, ti1, ti2] + x1ta[i,j,k,l] * (C[14, ti1, ti2] +
-                        x1ta[i,j,k,l] * C[15, ti1, ti2]))))))
-
-                    dPdrho[i,j,k,l] = P[i,j,k,l] / rho[i,j,k,l] * (C[1,ti1,ti2] + x1ta[i,j,k,l] * (2 * C[2,ti1,ti2] +
-                        x1ta[i,j,k,l] * 3 * C[3,ti1,ti2]) + x2ta[i,j,k,l]*(C[5,ti1,ti2] + x1ta[i,j,k,l] *
-                        (2 * C[6,ti1,ti2]+ x1ta[i,j,k,l] * 3 * C[7,ti1,ti2]) + x2ta[i,j,k,l] * (C[9,ti1,ti2] +
-                        x1ta[i,j,k,l] * (2 * C[10,ti1,ti2] + x1ta[i,j,k,l] * 3 * C[11,ti1,ti2]) + x2ta[i,j,k,l] *
-                        (C[13,ti1,ti2] + x1ta[i,j,k,l] * (2 * C[14,ti1,ti2] + x1ta[i,j,k,l] * 3 * C[15,ti1,ti2])))))
-
-                    dPde[i,j,k,l] = P[i,j,k,l] / (ei[i,j,k,l] + x2shift) * (C[4,ti1,ti2] + x1ta[i,j,k,l] * (C[5,ti1,ti2] +
-                        x1ta[i,j,k,l] * (C[6,ti1,ti2] + x1ta[i,j,k,l] * C[7,ti1,ti2])) + 2 * x2ta[i,j,k,l] * (C[8,ti1,ti2] +
-                        x1ta[i,j,k,l] * (C[9,ti1,ti2] + x1ta[i,j,k,l] * (C[10,ti1,ti2] + x1ta[i,j,k,l] * C[11,ti1,ti2])) +
-                        1.5 * x2ta[i,j,k,l] * (C[12,ti1,ti2] + x1ta[i,j,k,l] * (C[13,ti1,ti2] + x1ta[i,j,k,l] *
-                        (C[14,ti1,ti2] + x1ta[i,j,k,l] * C[15,ti1,ti2])))))
-    return P, dPdrho, dPde
-
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cpdef Tall3D(np.ndarray[DTYPEf_t, ndim=3] ei, np.ndarray[DTYPEf_t, ndim=3] C, np.ndarray[DTYPE_t, ndim=3] i1,
-             np.ndarray[DTYPE_t, ndim=3] i2, np.ndarray[DTYPEf_t, ndim=3] x1ta, np.ndarray[DTYPEf_t, ndim=3] x2ta,
-             DTYPEf_t x2shift):
-    cdef DTYPE_t i, j, k, ti1, ti2
-    cdef DTYPE_t nx = ei.shape[0]
-    cdef DTYPE_t ny = ei.shape[1]
-    cdef DTYPE_t nz = ei.shape[2]
-    cdef np.ndarray[DTYPEf_t, ndim=3] T = np.empty((nx, ny, nz), dtype=DTYPEf)
-    cdef np.ndarray[DTYPEf_t, ndim=3] dTde = np.empty((nx, ny, nz), dtype=DTYPEf)
-
-    # for i in range(nx):
-    for i in prange(nx, nogil=True):
-        for j in range(ny):
-            for k in range(nz):
-                ti1 = i1[i, j, k]
-                ti2 = i2[i, j, k]
-                T[i, j, k] = exp(C[0, ti1, ti2] + x1ta[i, j, k] * (C[1, ti1, ti2] + x1ta[i, j, k] * (C[2, ti1, ti2] +
-                    x1ta[i, j, k] * C[3, ti1, ti2])) + x2ta[i, j, k] * (C[4, ti1, ti2] + x1ta[i, j, k] * (C[5, ti1, ti2] +
-                    x1ta[i, j, k] * (C[6, ti1, ti2] + x1ta[i, j, k] * C[7, ti1, ti2])) + x2ta[i, j, k] * (C[8, ti1, ti2] +
-                    x1ta[i, j, k] * (C[9, ti1, ti2] + x1ta[i, j, k] * (C[10, ti1, ti2] + x1ta[i, j, k] * C[11, ti1, ti2])) +
-                    x2ta[i, j, k] * (C[12, ti1, ti2] + x1ta[i, j, k] * (C[13, ti1, ti2] + x1ta[i, j, k] * (C[14, ti1, ti2] +
-                    x1ta[i, j, k] * C[15, ti1, ti2]))))))
-
-                dTde[i,j,k] = T[i,j,k] / (ei[i,j,k] + x2shift) * (C[4,ti1,ti2] + x1ta[i,j,k] * (C[5,ti1,ti2] + x1ta[i,j,k] *
-                    (C[6,ti1,ti2] + x1ta[i,j,k] * C[7,ti1,ti2])) + 2 * x2ta[i,j,k] * (C[8,ti1,ti2] + x1ta[i,j,k] *
-                    (C[9,ti1,ti2] + x1ta[i,j,k] * (C[10,ti1,ti2] + x1ta[i,j,k] * C[11,ti1,ti2])) + 1.5 * x2ta[i,j,k] *
-                    (C[12,ti1,ti2] + x1ta[i,j,k] * (C[13,ti1,ti2] + x1ta[i,j,k] * (C[14,ti1,ti2] + x1ta[i,j,k] *
-                    C[15,ti1,ti2])))))
-    return T, dTde
-
-
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cpdef Tall4D(np.ndarray[DTYPEf_t, ndim=4] ei, np.ndarray[DTYPEf_t, ndim=3] C, np.ndarray[DTYPE_t, ndim=4] i1,
-             np.ndarray[DTYPE_t, ndim=4] i2, np.ndarray[DTYPEf_t, ndim=4] x1ta, np.ndarray[DTYPEf_t, ndim=4] x2ta,
-             DTYPEf_t x2shift):
-    cdef DTYPE_t i, j, k, l, ti1, ti2
-    cdef DTYPE_t nt = ei.shape[0]
-    cdef DTYPE_t nx = ei.shape[1]
-    cdef DTYPE_t ny = ei.shape[2]
-    cdef DTYPE_t nz = ei.shape[3]
-    cdef np.ndarray[DTYPEf_t, ndim=4] T = np.empty((nx, ny, nz), dtype=DTYPEf)
-    cdef np.ndarray[DTYPEf_t, ndim=4] dTde = np.empty((nx, ny, nz), dtype=DTYPEf)
-
-    for i in range(nt):
-        # for j in range(nx):
-        for j in prange(nx, nogil=True):
-            for k in range(ny):
-                for l in range(nz):
-                    ti1 = i1[i,j,k,l]
-                    ti2 = i2[i,j,k,l]
-                    T[i,j,k,l] = exp(C[0,ti1, ti2] + x1ta[i,j,k,l] * (C[1,ti1,ti2] + x1ta[i,j,k,l] * (C[2,ti1,ti2] +
-                        x1ta[i,j,k,l] * C[3,ti1,ti2])) + x2ta[i,j,k,l] * (C[4,ti1,ti2] + x1ta[i,j,k,l] * (C[5,ti1,ti2] +
-                        x1ta[i,j,k,l] * (C[6,ti1,ti2] + x1ta[i,j,k,l] * C[7,ti1,ti2])) + x2ta[i,j,k,l] * (C[8,ti1,ti2] +
-                        x1ta[i,j,k,l] * (C[9,ti1,ti2] + x1ta[i,j,k,l] * (C[10,ti1,ti2] + x1ta[i,j,k,l] * C[11,ti1, ti2])) +
-                        x2ta[i,j,k,l] * (C[12, ti1, ti2] + x1ta[i,j,k,l] * (C[13, ti1, ti2] + x1ta[i,j,k,l] *
-                        (C[14, ti1, ti2] + x1ta[i,j,k,l] * C[15, ti1, ti2]))))))
-
-                    dTde[i,j,k,l] = T[i,j,k,l] / (ei[i,j,k,l] + x2shift) * (C[4,ti1,ti2] + x1ta[i,j,k,l] * (C[5,ti1,ti2] +
-                        x1ta[i,j,k,l] * (C[6,ti1,ti2] + x1ta[i,j,k,l] * C[7,ti1,ti2])) + 2 * x2ta[i,j,k,l] * (C[8,ti1,ti2] +
-                        x1ta[i,j,k,l] * (C[9,ti1,ti2] + x1ta[i,j,k,l] * (C[10,ti1,ti2] + x1ta[i,j,k,l] * C[11,ti1,ti2])) +
-                        1.5 * x2ta[i,j,k,l] * (C[12,ti1,ti2] + x1ta[i,j,k,l] * (C[13,ti1,ti2] + x1ta[i,j,k,l] *
-                        (C[14,ti1,ti2] + x1ta[i,j,k,l] * C[15,ti1,ti2])))))
-    return T, dTde
+cpdef eos1D(np.ndarray[DTYPEfl_t, ndim=1] rho, np.ndarray[DTYPEfl_t, ndim=1] ei,
+            np.ndarray[DTYPEfl_t, ndim=3, mode="c"] C, np.ndarray[DTYPEfl_t, ndim=3, mode="c"] C2,
+            np.ndarray[DTYPEf64_t, ndim=1] lnx11d, np.ndarray[DTYPEf64_t, ndim=1] lnx21d, DTYPEf64_t x1off,
+            DTYPEf64_t x2off, DTYPEf64_t x1fac, DTYPEf64_t x2fac, DTYPEf64_t x2shift, Py_ssize_t n1, Py_ssize_t n2,
+            int mode):
+    """
+        Description:
+            Interpolates the eos-tables. Logarithms, indices of the grid-cells, interpolation-factors, the polynomial
+            and its derivatives are computed in one pass per cell, the coefficients of a cell are loaded once.
+        inputs:
+            :param rho: numpy-ndarray, 1D, flattened density-field
+            :param ei: numpy-ndarray, 1D, flattened internal energy-field
+            :param C: ndarray, (n1+1, n2+1, 16), interpolation coefficients of eos-file. rho, ei, C and C2 are either
+                      all float32 or all float64, the results have the same dtype.
+            :param C2: ndarray, (n1+1, n2+1, 16), second table of coefficients (only used with SECOND), or None
+            :param lnx11d: numpy-ndarray, 1D, logarithmic density-grid of eos-file
+            :param lnx21d: numpy-ndarray, 1D, logarithmic internal energy-grid of eos-file
+            :param x1off, x2off: float, first values of lnx11d and lnx21d
+            :param x1fac, x2fac: float, inverse step-sizes of lnx11d and lnx21d
+            :param x2shift: float, shift of internal energy
+            :param n1, n2: int, largest indices along density- and internal energy-dimension of C
+            :param mode: int, combination of EXP, DRHO, DEI and SECOND
+        output:
+            :return: list of 1D-ndarrays: the value of C, followed by its derivatives with respect to rho and ei, and
+                     the value of C2, each only if requested by :param mode:.
+    """
+    cdef Py_ssize_t i, ti1, ti2
+    cdef Py_ssize_t n = rho.shape[0]
+    cdef int nthreads = 1 if n < SERIAL_SIZE else eos_max_threads()
+    cdef DTYPEf64_t lnx1, lnx2, x1ta, x2ta, val, fac
+    cdef DTYPEfl_t* c
+    cdef bint expo = mode & EXP
+    cdef bint drho = mode & DRHO
+    cdef bint dei = mode & DEI
+    cdef bint second = mode & SECOND
+    cdef np.ndarray[DTYPEfl_t, ndim=1] out = np.empty(n, dtype=rho.dtype)
+    cdef np.ndarray[DTYPEfl_t, ndim=1] dvdrho = np.empty(n if drho else 0, dtype=rho.dtype)
+    cdef np.ndarray[DTYPEfl_t, ndim=1] dvde = np.empty(n if dei else 0, dtype=rho.dtype)
+    cdef np.ndarray[DTYPEfl_t, ndim=1] out2 = np.empty(n if second else 0, dtype=rho.dtype)
+
+    if second and C2 is None:
+        raise ValueError("SECOND needs a second table of coefficients.")
+
+    for i in prange(n, nogil=True, num_threads=nthreads):
+        lnx1 = log(rho[i])
+        lnx2 = log(ei[i] + x2shift)
+        # clamped before truncation: one step per axis, and NaN or inf never reach the integer conversion
+        ti1 = <Py_ssize_t>double_min(double_max((lnx1 - x1off) * x1fac, 0), n1)
+        ti2 = <Py_ssize_t>double_min(double_max((lnx2 - x2off) * x2fac, 0), n2)
+        x1ta = lnx1 - lnx11d[ti1]
+        x2ta = lnx2 - lnx21d[ti2]
+
+        c = &C[ti1, ti2, 0]
+        val = poly(c, x1ta, x2ta)
+        if expo:
+            val = exp(val)
+            fac = val
+        else:
+            fac = 1.0
+        out[i] = val
+        if drho:
+            dvdrho[i] = fac / rho[i] * poly_dx1(c, x1ta, x2ta)
+        if dei:
+            dvde[i] = fac / (ei[i] + x2shift) * poly_dx2(c, x1ta, x2ta)
+        if second:
+            out2[i] = exp(poly(&C2[ti1, ti2, 0], x1ta, x2ta))
+
+    res = [out]
+    if drho:
+        res.append(dvdrho)
+    if dei:
+        res.append(dvde)
+    if second:
+        res.append(out2)
+    return res
 
 
 @cython.cdivision(True)
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cpdef logPT2kappa3D(np.ndarray[DTYPEf_t, ndim=3] log10P, np.ndarray[DTYPEf_t, ndim=3] log10T,
-                    np.ndarray[DTYPEf_t, ndim=1] tabP, np.ndarray[DTYPEf_t, ndim=1] tabT,
-                    np.ndarray[DTYPEf_t, ndim=3] tabKap, np.ndarray[DTYPEf_t, ndim=1] tabTBN,
-                    np.ndarray[DTYPEf_t, ndim=1] tabDTB, np.ndarray[DTYPE_t, ndim=1] idxTBN,
-                    np.ndarray[DTYPEf_t, ndim=1] tabPBN, np.ndarray[DTYPEf_t, ndim=1] tabDPB,
-                    np.ndarray[DTYPE_t, ndim=1] idxPBN, DTYPE_t iband):
+cpdef PT2kappa3D(np.ndarray[DTYPEf_t, ndim=3] P, np.ndarray[DTYPEf_t, ndim=3] T,
+                 np.ndarray[DTYPEf_t, ndim=1] tabP, np.ndarray[DTYPEf_t, ndim=1] tabT,
+                 np.ndarray[DTYPEf_t, ndim=3] tabKap, np.ndarray[DTYPEf_t, ndim=1] tabTBN,
+                 np.ndarray[DTYPEf_t, ndim=1] tabDTB, np.ndarray[DTYPE_t, ndim=1] idxTBN,
+                 np.ndarray[DTYPEf_t, ndim=1] tabPBN, np.ndarray[DTYPEf_t, ndim=1] tabDPB,
+                 np.ndarray[DTYPE_t, ndim=1] idxPBN, DTYPE_t iband):
     cdef size_t i, j, k, iTx, iTx0, iTx1, iTx2, iPx, iPx0, iPx1, iPx2, nTx, nPx
     cdef DTYPE_t t1, t2, t3, t4, p1, p2, p3, p4
-    cdef DTYPE_t nx = log10T.shape[0]
-    cdef DTYPE_t ny = log10T.shape[1]
-    cdef DTYPE_t nz = log10T.shape[2]
+    cdef DTYPE_t nx = T.shape[0]
+    cdef DTYPE_t ny = T.shape[1]
+    cdef DTYPE_t nz = T.shape[2]
     cdef DTYPE_t NT = tabT.size - 1
     cdef DTYPE_t NP = tabP.size - 1
     cdef DTYPEf_t Tx, Px, gT1, gT2, gT3, gT4, gP1, gP2, gP3, gP4, fP1, fP2, fP3, fP4, dT, dT1, dtabT1, dtabT01
@@ -355,8 +185,8 @@ cpdef logPT2kappa3D(np.ndarray[DTYPEf_t, ndim=3] log10P, np.ndarray[DTYPEf_t, nd
     for i in range(nx):
         for j in range(ny):
             for k in range(nz):
-                Tx = float_min(tabT[NT - 1], float_max(tabT[1], log10T[i, j, k]))
-                Px = float_min(tabP[NP - 1], float_max(tabP[1], log10P[i, j, k]))
+                Tx = float_min(tabT[NT - 1], float_max(tabT[1], log10(T[i, j, k])))
+                Px = float_min(tabP[NP - 1], float_max(tabP[1], log10(P[i, j, k])))
 
                 if Tx < tabTBN[1]:
                     nTx = <int>((Tx - tabTBN[0]) / tabDTB[0]) + idxTBN[0]
@@ -418,24 +248,35 @@ cpdef logPT2kappa3D(np.ndarray[DTYPEf_t, ndim=3] log10P, np.ndarray[DTYPEf_t, nd
                 fP4 = tabKap[iTx0, iPx2, iband] * gT1 + tabKap[iTx, iPx2, iband] * gT2 + \
                       tabKap[iTx1, iPx2, iband] * gT3 + tabKap[iTx2, iPx2, iband] * gT4
 
-                xkaros[i, j, k] = fP1 * gP1 + fP2 * gP2 + fP3 * gP3 + fP4 * gP4
+                xkaros[i, j, k] = pow(10, fP1 * gP1 + fP2 * gP2 + fP3 * gP3 + fP4 * gP4)
     return xkaros
 
 
-@cython.cdivision(True)
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cpdef logPT2kappa4D(np.ndarray[DTYPEf_t, ndim=4] log10P, np.ndarray[DTYPEf_t, ndim=4] log10T,
+cpdef logPT2kappa3D(np.ndarray[DTYPEf_t, ndim=3] log10P, np.ndarray[DTYPEf_t, ndim=3] log10T,
                     np.ndarray[DTYPEf_t, ndim=1] tabP, np.ndarray[DTYPEf_t, ndim=1] tabT,
                     np.ndarray[DTYPEf_t, ndim=3] tabKap, np.ndarray[DTYPEf_t, ndim=1] tabTBN,
                     np.ndarray[DTYPEf_t, ndim=1] tabDTB, np.ndarray[DTYPE_t, ndim=1] idxTBN,
                     np.ndarray[DTYPEf_t, ndim=1] tabPBN, np.ndarray[DTYPEf_t, ndim=1] tabDPB,
                     np.ndarray[DTYPE_t, ndim=1] idxPBN, DTYPE_t iband):
+    # former interface of PT2kappa3D: takes log10(P) and log10(T), returns log10(kappa)
+    return np.log10(PT2kappa3D(np.power(DTYPEf(10), log10P), np.power(DTYPEf(10), log10T), tabP, tabT, tabKap,
+                               tabTBN, tabDTB, idxTBN, tabPBN, tabDPB, idxPBN, iband))
+
+
+@cython.cdivision(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef PT2kappa4D(np.ndarray[DTYPEf_t, ndim=4] P, np.ndarray[DTYPEf_t, ndim=4] T,
+                 np.ndarray[DTYPEf_t, ndim=1] tabP, np.ndarray[DTYPEf_t, ndim=1] tabT,
+                 np.ndarray[DTYPEf_t, ndim=3] tabKap, np.ndarray[DTYPEf_t, ndim=1] tabTBN,
+                 np.ndarray[DTYPEf_t, ndim=1] tabDTB, np.ndarray[DTYPE_t, ndim=1] idxTBN,
+                 np.ndarray[DTYPEf_t, ndim=1] tabPBN, np.ndarray[DTYPEf_t, ndim=1] tabDPB,
+                 np.ndarray[DTYPE_t, ndim=1] idxPBN, DTYPE_t iband):
     cdef DTYPE_t i, j, k, l, iTx, iTx0, iTx1, iTx2, iPx, iPx0, iPx1, iPx2, nTx, nPx
-    cdef DTYPE_t nt = log10T.shape[0]
-    cdef DTYPE_t nx = log10T.shape[1]
-    cdef DTYPE_t ny = log10T.shape[2]
-    cdef DTYPE_t nz = log10T.shape[2]
+    cdef DTYPE_t nt = T.shape[0]
+    cdef DTYPE_t nx = T.shape[1]
+    cdef DTYPE_t ny = T.shape[2]
+    cdef DTYPE_t nz = T.shape[3]
     cdef DTYPE_t NT = tabT.size - 1
     cdef DTYPE_t NP = tabP.size - 1
     cdef DTYPEf_t Tx, Px, gT1, gT2, gT3, gT4, gP1, gP2, gP3, gP4, fP1, fP2, fP3, fP4, dT, dT1, dtabT1, dtabT01
@@ -445,8 +286,8 @@ cpdef logPT2kappa4D(np.ndarray[DTYPEf_t, ndim=4] log10P, np.ndarray[DTYPEf_t, nd
         for j in range(nx):
             for k in range(ny):
                 for l in range(nz):
-                    Tx = float_min(tabT[NT-1], float_max(tabT[1], log10T[i, j, k, l]))
-                    Px = float_min(tabP[NP-1], float_max(tabP[1], log10P[i, j, k, l]))
+                    Tx = float_min(tabT[NT-1], float_max(tabT[1], log10(T[i, j, k, l])))
+                    Px = float_min(tabP[NP-1], float_max(tabP[1], log10(P[i, j, k, l])))
 
                     if Tx < tabTBN[1]:
                         nTx = <int>((Tx - tabTBN[0]) / tabDTB[0]) + idxTBN[0]
@@ -507,10 +348,21 @@ cpdef logPT2kappa4D(np.ndarray[DTYPEf_t, ndim=4] log10P, np.ndarray[DTYPEf_t, nd
                     fP4 = tabKap[iTx0, iPx2, iband] * gT1 + tabKap[iTx, iPx2, iband] * gT2 + \
                           tabKap[iTx1, iPx2, iband] * gT3 + tabKap[iTx2, iPx2, iband] * gT4
 
-                    xkaros[i, j, k, l] = fP1 * gP1 + fP2 * gP2 + fP3 * gP3 + fP4 * gP4
+                    xkaros[i, j, k, l] = pow(10, fP1 * gP1 + fP2 * gP2 + fP3 * gP3 + fP4 * gP4)
     return xkaros
 
 
+cpdef logPT2kappa4D(np.ndarray[DTYPEf_t, ndim=4] log10P, np.ndarray[DTYPEf_t, ndim=4] log10T,
+                    np.ndarray[DTYPEf_t, ndim=1] tabP, np.ndarray[DTYPEf_t, ndim=1] tabT,
+                    np.ndarray[DTYPEf_t, ndim=3] tabKap, np.ndarray[DTYPEf_t, ndim=1] tabTBN,
+                    np.ndarray[DTYPEf_t, ndim=1] tabDTB, np.ndarray[DTYPE_t, ndim=1] idxTBN,
+                    np.ndarray[DTYPEf_t, ndim=1] tabPBN, np.ndarray[DTYPEf_t, ndim=1] tabDPB,
+                    np.ndarray[DTYPE_t, ndim=1] idxPBN, DTYPE_t iband):
+    # former interface of PT2kappa4D: takes log10(P) and log10(T), returns log10(kappa)
+    return np.log10(PT2kappa4D(np.power(DTYPEf(10), log10P), np.power(DTYPEf(10), log10T), tabP, tabT, tabKap,
+                               tabTBN, tabDTB, idxTBN, tabPBN, tabDPB, idxPBN, iband))
+
+
 
 @cython.cdivision(True)
 @cython.boundscheck(False)
@@ -150,19 +150,15 @@ class Opac:
                 """
         if not eosx_available:
             raise IOError("Compilation of eosinterx.pyx necessary.")
-        log10P = ne.evaluate("log10(P)")
-        log10T = ne.evaluate("log10(T)")
-
         if T.ndim == 3:
-            func = eosx.logPT2kappa3D
+            func = eosx.PT2kappa3D
         elif T.ndim == 4:
-            func = eosx.logPT2kappa4D
+            func = eosx.PT2kappa4D
         else:
             raise ValueError("Wrong dimension. Only 3D- and 4D-arrays supported.")
 
-        return ne.evaluate("10**kap", local_dict={'kap': func(log10P, log10T, self.tabP, self.tabT, self.tabKap,
-                                                              self.tabTBN, self.tabDTB, self.idxTBN, self.tabPBN,
-                                                              self.tabDPB, self.idxPBN, iBand)})
+        return func(P, T, self.tabP, self.tabT, self.tabKap, self.tabTBN, self.tabDTB, self.idxTBN, self.tabPBN,
+                    self.tabDPB, self.idxPBN, iBand)
 
     def tau(self, rho, axis=-1, **kwargs):
         """
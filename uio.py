@@ -11,21 +11,30 @@ Modified: René Salhab (10.03.2017)
 
 import os
 import re
+import mmap
 import collections
 import numpy as np
 from struct import Struct
 
 _uint_from_bytes = Struct('>I')
 
+_re_params = re.compile(r"(\w+)=(?:'([^']*)'|(\S+))")
+_re_desc = re.compile(r"^(\w+) (\w+) ?(.*)$")
+_re_dims = re.compile(r"(\d+):(\d+)")
+
 class _EntryMapping(collections.Mapping):
     def __init__(self, entries):
         self._entries = entries
+        self._by_name = {}
+        for e in entries:
+            # the first entry of a name wins, as with a linear search
+            self._by_name.setdefault(e.name, e)
 
     def __getitem__(self, key):
-        for e in self._entries:
-            if e.name == key:
-                return e
-        raise KeyError('%s' % key)
+        e = self._by_name.get(key)
+        if e is None:
+            raise KeyError('%s' % key)
+        return e
 
     def __iter__(self):
         for e in self._entries:
@@ -50,14 +59,16 @@ class _EntryMapping(collections.Mapping):
 
 
 class Entry(object):
-    def __init__(self, fd, pos, type, name, params, dtype, shape):
-        self._fd = fd
+    def __init__(self, mm, pos, type, name, params, dtype, shape, cache=False):
+        self._mm = mm
         self.pos = pos
         self.type = type
         self.name = name
         self.params = params
         self.dtype = dtype
         self.shape = shape
+        self._cache = cache
+        self._data = None
 
     def __repr__(self):
         slist = [self.type, self.name]
@@ -71,31 +82,35 @@ class Entry(object):
 
     @property
     def data(self):
-        self._fd.seek(self.pos)
+        if self._data is not None:
+            return self._data
         a = self._read_array()
         if self.type != 'character':
-            return a.reshape(self.shape) if self.shape != None else a[0]
+            data = a.reshape(self.shape) if self.shape != None else a[0]
         else:
             if self.shape == None:
-                return a[0].rstrip()
+                data = a[0].rstrip()
             elif len(self.shape) == 1:
-                return [s.rstrip() for s in a]
+                data = [s.rstrip() for s in a]
             else:
-                return a.reshape(self.shape)
+                data = a.reshape(self.shape)
+        if self._cache:
+            self._data = data
+        return data
 
     def _read_array(self):
         dt = np.dtype(self.dtype).newbyteorder('>')
-        nbytes = self._read_block_size()
-        data = np.fromfile(self._fd, dtype=dt, count=nbytes // dt.itemsize)
-        if nbytes != self._read_block_size():
-            raise IOError('error reading array')
-        return data.astype(data.dtype.newbyteorder('='))
-
-    def _read_block_size(self):
-        data = self._fd.read(4)
-        if len(data) != 4:
+        start = self.pos + 4
+        if start > len(self._mm):
             raise EOFError()
-        return _uint_from_bytes.unpack(data)[0]
+        nbytes = _uint_from_bytes.unpack_from(self._mm, self.pos)[0]
+        if start + nbytes + 4 > len(self._mm) or nbytes != _uint_from_bytes.unpack_from(self._mm, start + nbytes)[0]:
+            raise IOError('error reading array')
+        # view into the memory-mapped file; the only copy is made when converting into an array owned by the entry
+        data = np.frombuffer(self._mm, dtype=dt, count=nbytes // dt.itemsize, offset=start)
+        if not dt.isnative:
+            return data.byteswap().view(dt.newbyteorder('='))
+        return data.copy()
 
 
 class Block(_EntryMapping):
@@ -136,13 +151,12 @@ class DataSet(_EntryMapping):
         return '<%s>' % (' '.join(slist))
 
 class File(_EntryMapping):
-    def __init__(self, filename):
+    def __init__(self, filename, cache=False):
         _, fend = os.path.splitext(filename)
         self._fd = open(os.path.abspath(filename), 'rb')
-
-        self._re_params = re.compile(r"\w+=(?:(?:'[^']*')|(?:\S+))")
-        self._re_desc = re.compile(r"^(\w+) (\w+) ?(.*)$")
-        self._re_dims = re.compile('\d+:\d+')
+        # arrays are read through a memory-map, descriptors through the file-object
+        self._mm = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cache = cache
 
         self._fd.seek(0)
         ff, uio, self.header = self._parse_descriptor()
@@ -180,9 +194,10 @@ class File(_EntryMapping):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._fd.close()
+        self.close()
 
     def close(self):
+        self._mm.close()
         self._fd.close()
 
     @property
@@ -265,11 +280,11 @@ class File(_EntryMapping):
         shape = None
         if 'd' in params:
             fshape = []
-            for x in self._re_dims.findall(params['d']):
-                x1, x2 = x.split(':')
+            for x1, x2 in _re_dims.findall(params['d']):
                 fshape.append(int(x2) - int(x1) + 1)
             shape = tuple(reversed(fshape))
-        return Entry(fd=self._fd, pos=pos, type=etype, name=name, params=params, dtype=dtype, shape=shape)
+        return Entry(mm=self._mm, pos=pos, type=etype, name=name, params=params, dtype=dtype, shape=shape,
+                     cache=self._cache)
 
     def _read_string(self):
         s = self._read_block()
@@ -297,14 +312,11 @@ class File(_EntryMapping):
         return _uint_from_bytes.unpack(data)[0]
 
     def _parse_descriptor(self):
-        m = self._re_desc.match(self._read_string().decode())
+        m = _re_desc.match(self._read_string().decode())
         if not m:
             return None
         etype, name, pstr = m.groups()
-        params = {}
-        for it in self._re_params.findall(pstr):
-            key, value = it.split('=', 1)
-            params[key] = value.strip("'")
+        params = {key: quoted or value for key, quoted, value in _re_params.findall(pstr)}
         return etype, name, params
 
 if __name__ == '__main__':